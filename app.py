@@ -2,6 +2,9 @@ import streamlit as st
 import re
 import json
 import html
+import hashlib
+import functools
+import numpy as np
 import pandas as pd
 from typing import Optional
 from datetime import datetime
@@ -21,8 +24,8 @@ from utils import (
 
 # ─── Database & Auth imports ──────────────────────────────────────────────
 from db import (
-    init_db,
-    save_analysis, list_analyses, save_embedding, delete_analysis, get_conn,
+    init_db, ensure_migrations,
+    save_analysis, list_analyses, save_embeddings_batch, delete_analysis, get_conn,
     verify_user, get_user_by_email, register_user,
     q  # ← Import the q() helper for SQL placeholder conversion
 )
@@ -36,12 +39,17 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialize DB
-init_db()
-try:
-    ensure_migrations()
-except Exception:
-    pass
+# Initialize DB (once per process; Streamlit reruns this script on every interaction)
+@st.cache_resource
+def setup_database():
+    init_db()
+    try:
+        ensure_migrations()
+    except Exception:
+        pass
+    return True
+
+setup_database()
 
 # Cached models
 @st.cache_resource
@@ -55,14 +63,67 @@ def load_spacy_model():
 @st.cache_resource
 def load_embedding_model():
     # try:
+    #     import torch
     #     from sentence_transformers import SentenceTransformer
-    #     return SentenceTransformer("all-MiniLM-L6-v2")
+    #     model = SentenceTransformer("all-MiniLM-L6-v2")
+    #     if torch.cuda.is_available():
+    #         model = model.half().to("cuda")
+    #     return model
     # except Exception:
         return None
 
 nlp = load_spacy_model()
 embed_model = None
 
+# NER / obligations extraction is switched off; spaCy is skipped while this is False
+EXTRACT_ENTITIES = False
+
+# Unit-length vectors, so cosine similarity is a plain dot product
+ENCODE_KWARGS = dict(batch_size=64, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False)
+
+@st.cache_data(show_spinner=False)
+def encode_query(query: str):
+    return embed_model.encode(query, **ENCODE_KWARGS)
+
+@st.cache_data(show_spinner=False)
+def encode_clauses(text_hash: str, _clauses: tuple):
+    # Keyed on the contract hash only; the leading underscore keeps Streamlit from hashing the clauses
+    return embed_model.encode(list(_clauses), **ENCODE_KWARGS)
+
+RISK_BADGES = {"High": "🔴 HIGH RISK", "Medium": "🟠 MEDIUM RISK", "Low": "🟢 LOW RISK"}
+
+HIGHLIGHT_STYLE = "background:#fef08a;color:#854d0e;padding:1px 4px;border-radius:3px;"
+
+@functools.lru_cache(maxsize=256)
+def highlight_pattern(terms: tuple):
+    """Compiled longest-first alternation for a set of terms, built once per term set."""
+    return re.compile("|".join(re.escape(t) for t in terms), flags=re.I)
+
+def highlight_key(terms) -> tuple:
+    """Distinct terms longer than two characters, longest first (stable cache key)."""
+    return tuple(sorted({t.strip() for t in terms if t and len(t.strip()) > 2}, key=lambda t: (-len(t), t)))
+
+def highlight(body: str, terms, style: str = HIGHLIGHT_STYLE) -> str:
+    """Wrap every occurrence of the given terms in a styled span, in one regex pass."""
+    terms = highlight_key(terms)
+    if not terms:
+        return body
+    return highlight_pattern(terms).sub(lambda m: f"<span style='{style}'>{m.group(0)}</span>", body)
+
+def highlight_escaped(text: str, terms, style: str = HIGHLIGHT_STYLE) -> str:
+    """HTML-escape raw text and wrap matched terms in the same single scan."""
+    terms = highlight_key(terms)
+    if not terms:
+        return html.escape(text)
+    chunks = []
+    last = 0
+    for m in highlight_pattern(terms).finditer(text):
+        chunks.append(html.escape(text[last:m.start()]))
+        chunks.append(f"<span style='{style}'>{html.escape(m.group(0))}</span>")
+        last = m.end()
+    chunks.append(html.escape(text[last:]))
+    return "".join(chunks)
+
 
 # ────────────────────────────────────────────────
 #  Custom styles
@@ -212,28 +273,37 @@ st.sidebar.markdown(f"**Detected language:** {lang}")
 
 normalized_text = contract_text
 if lang.lower().startswith("hi"):
-    normalized_text = normalize_to_english(contract_text)
+    normalized_text = strip_html_tags(normalize_to_english(contract_text))
+
+# Content key for caches that should survive reruns and re-uploads
+text_hash = hashlib.blake2b(normalized_text.encode("utf-8"), digest_size=16).hexdigest()
 
 # Clause extraction & analysis
+# normalized_text is already tag-free, so clauses need no second strip_html_tags pass;
+# the same clean string feeds spaCy, the risk scorer and the suggestions
 clauses = extract_clauses(normalized_text)
 
+# spaCy only runs when its output is used; batched through nlp.pipe instead of one call per clause
+if advanced and nlp and EXTRACT_ENTITIES:
+    docs = nlp.pipe(clauses, batch_size=32)
+else:
+    docs = [None] * len(clauses)
+
 rows = []
-for i, clause in enumerate(clauses, start=1):
-    clause = strip_html_tags(clause)
+for i, (clause, doc) in enumerate(zip(clauses, docs), start=1):
     ner_entities = []
     obligations = []
 
-    if advanced and nlp:
-        doc = nlp(clause)
-        # Uncomment if you want NER and obligations extraction
-        # ner_entities = [{"text": ent.text, "label": ent.label_} for ent in doc.ents]
-        # obligations = []
-        # for sent in getattr(doc, "sents", []):
-        #     if re.search(r'\bshall\b|\bmust\b|\bagree to\b|\bwill\b', sent.text, flags=re.I):
-        #         obligations.append(sent.text)
+    # Uncomment (and set EXTRACT_ENTITIES = True) if you want NER and obligations extraction
+    # if doc is not None:
+    #     ner_entities = [{"text": ent.text, "label": ent.label_} for ent in doc.ents]
+    #     for sent in getattr(doc, "sents", []):
+    #         if re.search(r'\bshall\b|\bmust\b|\bagree to\b|\bwill\b', sent.text, flags=re.I):
+    #             obligations.append(sent.text)
 
-    risk, reasons, risk_score = analyze_clause_risk(clause)
-    suggestion = suggest_alternatives_for_clause(clause, risk, reasons)
+    clause_lower = clause.lower()
+    risk, reasons, risk_score = analyze_clause_risk(clause, clause_lower)
+    suggestion = suggest_alternatives_for_clause(clause, risk, reasons, clause_lower)
 
     rows.append({
         "id": i,
@@ -248,6 +318,9 @@ for i, clause in enumerate(clauses, start=1):
     })
 
 df = pd.DataFrame(rows)
+if not df.empty:
+    df["risk"] = pd.Categorical(df["risk"], categories=["High", "Medium", "Low"])
+    df = df.astype({"id": "int32", "risk_score": "int16"})
 
 # ────────────────────────────────────────────────
 #  KPIs
@@ -264,9 +337,10 @@ col_lang.markdown(
 col_total.metric("Total Clauses", len(df))
 
 if not df.empty and "risk" in df.columns:
-    high_count   = int((df["risk"] == "High").sum())
-    medium_count = int((df["risk"] == "Medium").sum())
-    low_count    = int((df["risk"] == "Low").sum())
+    risk_counts  = df["risk"].value_counts()
+    high_count   = int(risk_counts.get("High", 0))
+    medium_count = int(risk_counts.get("Medium", 0))
+    low_count    = int(risk_counts.get("Low", 0))
     col_high.metric("🔴 High",   high_count)
     col_medium.metric("🟠 Medium", medium_count)
     col_low.metric("🟢 Low",    low_count)
@@ -283,19 +357,14 @@ st.markdown("### 🔍 Find similar clauses")
 query = st.text_input("Enter text to find similar clauses", "")
 
 if query and embed_model is not None and not df.empty:
-    docs = df["clause"].tolist()
-
-    if "clause_embeddings" not in st.session_state:
-        with st.spinner("Computing embeddings..."):
-            embeddings = embed_model.encode(docs, convert_to_numpy=True)
-            st.session_state["clause_embeddings"] = embeddings
+    with st.spinner("Computing embeddings..."):
+        clause_embeddings = encode_clauses(text_hash, tuple(df["clause"]))
 
-    q_emb = embed_model.encode(query, convert_to_numpy=True)
-    import numpy as np
-    from sentence_transformers import util
-
-    similarities = util.cos_sim(q_emb, st.session_state["clause_embeddings"])[0]
-    top_indices = similarities.argsort(descending=True)[:5]
+    q_emb = encode_query(query)
+    similarities = clause_embeddings @ q_emb
+    k = min(5, len(similarities))
+    top_indices = np.argpartition(-similarities, k - 1)[:k]
+    top_indices = top_indices[np.argsort(-similarities[top_indices])]
 
     if len(top_indices) == 0:
         st.info("No similar clauses found.")
@@ -304,17 +373,7 @@ if query and embed_model is not None and not df.empty:
         for rank, idx in enumerate(top_indices, 1):
             row = df.iloc[int(idx)]
             score = float(similarities[idx]) * 100
-            clean_clause = html.escape(row['clause'][:600])
-
-            if query.strip():
-                for term in query.split():
-                    if len(term.strip()) > 2:
-                        clean_clause = re.sub(
-                            re.escape(term),
-                            f"<span style='background:#fef08a;color:#854d0e;padding:1px 4px;border-radius:3px;'>{term}</span>",
-                            clean_clause,
-                            flags=re.I
-                        )
+            clean_clause = highlight_escaped(row['clause'][:600], query.split())
 
             st.markdown(
                 f"""
@@ -336,9 +395,9 @@ if query and embed_model is not None and not df.empty:
 # ────────────────────────────────────────────────
 st.markdown("### 📑 Risk Analysis by Clause")
 
-for idx, row in df.iterrows():
-    clause_num = row['id']
-    full_text = row['clause'].strip()
+for row in df.itertuples(index=False):
+    clause_num = row.id
+    full_text = row.clause.strip()
 
     lines = [line.strip() for line in full_text.split('\n') if line.strip()]
     title = "Clause Content"
@@ -347,44 +406,30 @@ for idx, row in df.iterrows():
         title = re.sub(r'^\d+\.?\s*|Clause\s*\d+\s*[-—]?\s*', '', lines[0], flags=re.I).strip()
         body = '\n'.join(lines[1:]).strip() if len(lines) > 1 else full_text
 
-    risk_lower = row['risk'].lower()
-    if risk_lower == 'high':
-        badge = "🔴 HIGH RISK"
-    elif risk_lower == 'medium':
-        badge = "🟠 MEDIUM RISK"
-    else:
-        badge = "🟢 LOW RISK"
-
-    reasons_list = [r.strip() for r in (row['reasons'] or '').split(',') if r.strip()]
-    highlighted_body = body
-    for term in reasons_list:
-        if term and len(term) > 2:
-            highlighted_body = re.sub(
-                re.escape(term),
-                f"<span style='background:#fef08a;color:#854d0e;padding:1px 4px;border-radius:3px;'>{term}</span>",
-                highlighted_body,
-                flags=re.I
-            )
+    badge = RISK_BADGES.get(row.risk, "🟢 LOW RISK")
+
+    reasons_list = [r.strip() for r in (row.reasons or '').split(',') if r.strip()]
+    highlighted_body = highlight(body, reasons_list)
 
     body_with_breaks = highlighted_body.replace('\n', '  \n')
 
-    main_reason = row.get('explanation', f"Key issues: {row['reasons'] or '—'}").strip()
+    main_reason = getattr(row, 'explanation', f"Key issues: {row.reasons or '—'}").strip()
 
     st.markdown(f"""
 **Clause {clause_num} — {badge} {title}**
 
 {body_with_breaks}
 
-* **Risk Level**: {row['risk']} Risk
+* **Risk Level**: {row.risk} Risk
 * **Main Reason**: {main_reason}
 
 **Detected issues**: {', '.join(reasons_list) if reasons_list else '—'}
     """, unsafe_allow_html=True)
 
-    if row.get('suggestion'):
+    if getattr(row, 'suggestion', None):
         st.markdown(f"""
 > 💡 **Suggested rewrite**  
-> {row['suggestion'].strip()}
+> {row.suggestion.strip()}
         """)
 
     st.markdown("---")
@@ -408,9 +453,9 @@ if st.sidebar.button("💾 Save analysis"):
 
     if analysis_id is not None:
         if embed_model is not None:
-            vectors = embed_model.encode(df["clause"].tolist(), convert_to_numpy=True).tolist()
-            for r, vec in zip(df.to_dict(orient="records"), vectors):
-                save_embedding(int(analysis_id), int(r["id"]), "all-MiniLM-L6-v2", vec)
+            # Same cache as the similarity search, so clauses already encoded there are not re-encoded
+            vectors = encode_clauses(text_hash, tuple(df["clause"]))
+            save_embeddings_batch(int(analysis_id), "all-MiniLM-L6-v2", vectors, clause_numbers=df["id"].tolist())
 
         audit = {
             "analysis_id": analysis_id,
@@ -434,7 +479,7 @@ if st.sidebar.button("💾 Save analysis"):
 #  SME-friendly templates
 # ────────────────────────────────────────────────
 st.markdown("### 🧾 SME-friendly Templates & Suggested Rewrites")
-templates = load_templates()
+templates = load_templates()  # mtime-cached in utils
 for t in templates[:6]:
     st.markdown(f"**{t['title']}** — {t['description']}")
     st.code(t['text'][:800] + ("..." if len(t['text']) > 800 else ""))
@@ -447,11 +492,14 @@ st.sidebar.markdown("### Admin Tools")
 if "analyses_refresh" not in st.session_state:
     st.session_state["analyses_refresh"] = 0.0
 
-if st.sidebar.button("📋 Refresh / Manage Analyses", key=f"list_{st.session_state['analyses_refresh']}"):
-    analyses = list_analyses(owner_id=st.session_state.user["id"]) or []
-    st.session_state["current_analyses"] = analyses
-else:
-    analyses = st.session_state.get("current_analyses", list_analyses(owner_id=st.session_state.user["id"]) or [])
+# Query once and keep the list in session state; Refresh, Save and Delete All reload it
+refresh_clicked = st.sidebar.button("📋 Refresh / Manage Analyses", key=f"list_{st.session_state['analyses_refresh']}")
+if refresh_clicked or "current_analyses" not in st.session_state:
+    st.session_state["current_analyses"] = list_analyses(owner_id=st.session_state.user["id"]) or []
+analyses = st.session_state["current_analyses"]
+
+# id -> row, filled while listing so the delete dialog can look its analysis up directly
+analyses_by_id = {}
 
 if not analyses:
     st.sidebar.info("No saved analyses yet.")
@@ -475,6 +523,7 @@ else:
             "language": item[3],
             "total_clauses": item[4] if len(item) > 4 else None
         }
+        analyses_by_id[row["id"]] = row
 
         cols = st.sidebar.columns([1, 5, 3, 1, 1])
         cols[0].write(row["id"])
@@ -495,14 +544,9 @@ else:
 # Confirmation dialog for delete
 if "confirm_delete_id" in st.session_state:
     cid = st.session_state["confirm_delete_id"]
-    analyses = st.session_state.get("current_analyses", list_analyses(owner_id=st.session_state.user["id"]) or [])
-    name = "this analysis"
-    for it in analyses:
-        if (isinstance(it, tuple) and it[0] == cid) or (isinstance(it, dict) and it.get("id") == cid):
-            name = it[1] if isinstance(it, tuple) else it.get("name", name)
-            break
+    name = analyses_by_id.get(cid, {}).get("name", "this analysis")
 
-        st.sidebar.warning(f'**Delete #{cid}?**  \n"{name}" will be **permanently removed**.')
+    st.sidebar.warning(f'**Delete #{cid}?**  \n"{name}" will be **permanently removed**.')
 
     c1, c2 = st.sidebar.columns(2)
 
@@ -512,7 +556,12 @@ if "confirm_delete_id" in st.session_state:
             st.sidebar.success(f"Deleted #{cid}")
             st.session_state.pop("confirm_delete_id", None)
             st.session_state["analyses_refresh"] += 1
-            st.session_state.pop("current_analyses", None)
+            # Drop the deleted row in place instead of re-querying the whole list
+            cached = st.session_state.get("current_analyses", [])
+            pos = next((i for i, it in enumerate(cached)
+                        if (it.get("id") if isinstance(it, dict) else it[0]) == cid), None)
+            if pos is not None:
+                del cached[pos]
             st.rerun()
         except Exception as e:
             st.sidebar.error(f"Delete failed: {str(e)}")
@@ -524,7 +573,7 @@ if "confirm_delete_id" in st.session_state:
         st.rerun()
 
 # Final footer
-if not looks_like_contract(contract_text):
+if not looks_like_contract(contract_text, lang):
     st.warning("⚠️ Uploaded document may not be a legal contract (low keyword density).")
 
 st.markdown("---")
@@ -545,13 +594,11 @@ if st.sidebar.button("🧹 Delete ALL **YOUR** Analyses", type="primary"):
                 cur = conn.cursor()
                 user_id = st.session_state.user["id"]
                 
+                # Clauses and embeddings go with their analyses via ON DELETE CASCADE
                 # Use q() to convert placeholders automatically for SQLite/MySQL compatibility
-                cur.execute(q("DELETE FROM embeddings WHERE analysis_id IN (SELECT id FROM analyses WHERE owner_id = %s)"), (user_id,))
-                cur.execute(q("DELETE FROM clauses WHERE analysis_id IN (SELECT id FROM analyses WHERE owner_id = %s)"), (user_id,))
                 cur.execute(q("DELETE FROM analyses WHERE owner_id = %s"), (user_id,))
                 
                 conn.commit()
-                conn.close()
 
                 st.session_state.pop("current_analyses", None)
                 st.session_state["analyses_refresh"] = datetime.now().timestamp()
@@ -561,8 +608,8 @@ if st.sidebar.button("🧹 Delete ALL **YOUR** Analyses", type="primary"):
                 
             except Exception as e:
                 st.sidebar.error(f"Reset failed: {str(e)}")
-                if 'conn' in locals() and hasattr(conn, 'close'):
+                if 'conn' in locals() and hasattr(conn, 'rollback'):
                     try:
-                        conn.close()
+                        conn.rollback()  # shared per-thread connection; don't leave the delete half-open
                     except:
                         pass
@@ -1,6 +1,11 @@
 import re
 from typing import List
 
+_RE_WS = re.compile(r'\s+')
+_RE_NUMBERED = re.compile(r'\d+\.\s+')
+_RE_SENT = re.compile(r'(?<=[.!?]) +')
+
+
 def extract_clauses(text: str) -> List[str]:
     """
     Robust clause extractor that works for:
@@ -13,18 +18,21 @@ def extract_clauses(text: str) -> List[str]:
     if not text or len(text.strip()) < 40:
         return []
 
-    # Normalize spacing
-    t = re.sub(r'\r\n?', '\n', text)
-    t = re.sub(r'\n+', '\n', t)
-    t = re.sub(r'\s+', ' ', t)
+    # Normalize spacing (\s covers \r and \n, so one pass handles line endings too)
+    t = _RE_WS.sub(' ', text)
 
-    # 1️⃣ Try numbered clauses first
-    numbered = re.split(r'(?=\d+\.\s+)', t)
-    clauses = [c.strip() for c in numbered if len(c.strip()) > 60]
+    # 1️⃣ Try numbered clauses first (cut the text at each "N. " marker);
+    # unnumbered text goes straight to the sentence split
+    clauses = []
+    markers = [m.start() for m in _RE_NUMBERED.finditer(t)]
+    if markers:
+        starts = [0] + markers + [len(t)]
+        numbered = [t[a:b] for a, b in zip(starts, starts[1:])]
+        clauses = [c.strip() for c in numbered if len(c.strip()) > 60]
 
     # 2️⃣ If numbering not found → split by sentences
     if len(clauses) < 2:
-        sentences = re.split(r'(?<=[.!?]) +', t)
+        sentences = _RE_SENT.split(t)
         clauses = [s.strip() for s in sentences if len(s.strip()) > 80]
 
     # 3️⃣ If still empty → split by paragraphs
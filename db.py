@@ -1,13 +1,36 @@
 import os
 import json
+import functools
+import logging
+from contextlib import closing, contextmanager
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from urllib.parse import urlparse
 
 import sqlite3
+import threading
+import numpy as np
 import pymysql
 from werkzeug.security import generate_password_hash, check_password_hash
 
+try:
+    from dbutils.pooled_db import PooledDB
+except ImportError:
+    PooledDB = None
+
+try:
+    from cachetools import TTLCache
+except ImportError:
+    TTLCache = None
+
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerificationError, InvalidHashError
+except ImportError:
+    PasswordHasher = None
+
+logger = logging.getLogger(__name__)
+
 # ============================================================
 # Database Configuration
 # ============================================================
@@ -15,12 +38,40 @@ from werkzeug.security import generate_password_hash, check_password_hash
 # DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///contract_analysis.db")
 DATABASE_URL = "sqlite:///contract_analysis.db"
 
+# Password hashing method passed to werkzeug, e.g. "pbkdf2:sha256:600000" or a
+# cheaper "pbkdf2:sha256:1000" for dev/CI. Unset uses argon2 when argon2-cffi is
+# installed, otherwise werkzeug's default.
+# Stored hashes carry their own method, so verify_user works across changes.
+PW_HASH_METHOD = os.getenv("PW_HASH_METHOD")
+
+_PH = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1) if PasswordHasher is not None else None
+
+
+
+# Rows pulled per fetchmany() call when reading potentially large result sets
+FETCH_BATCH_SIZE = 256
+
+# Clause rows per executemany() call in save_analysis
+INSERT_BATCH_SIZE = 500
+
+# Element type codes stored in embeddings.dtype
+EMBEDDING_DTYPE_FLOAT32 = 0
+EMBEDDING_DTYPES = {EMBEDDING_DTYPE_FLOAT32: np.float32}
 
 
 # ============================================================
 # Helper Functions
 # ============================================================
 
+def _utcnow():
+    """
+    created_at value: a datetime for MySQL's DATETIME(6) columns, an ISO string
+    for SQLite, which stores TEXT (its datetime adapter is deprecated)
+    """
+    now = datetime.utcnow()
+    return now if is_mysql() else now.isoformat()
+
+
 def is_mysql():
     """Check if using MySQL database"""
     return DATABASE_URL.startswith("mysql")
@@ -28,44 +79,123 @@ def is_mysql():
 
 def q(sql):
     """Convert MySQL placeholders (%s) to SQLite placeholders (?) automatically"""
-    return sql if is_mysql() else sql.replace("%s", "?")
+    return sql if is_mysql() else _sqlite_sql(sql)
+
+
+@functools.lru_cache(maxsize=None)
+def _sqlite_sql(sql):
+    """Placeholder rewrite for q(); the SQL strings are fixed, so each is converted once"""
+    return sql.replace("%s", "?")
 
 
 # ============================================================
 # Connection
 # ============================================================
 
+# One connection per thread, opened on first use and reused by every helper
+# below; helpers commit their own work and leave the connection open.
+_TLS = threading.local()
+
+# MySQL connections are drawn from a shared pool when DBUtils is installed, so a
+# new thread reuses a warm connection instead of redoing the TCP/auth handshake.
+# A pooled connection goes back to the pool when its thread's cache is dropped.
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _mysql_params():
+    """pymysql.connect() keyword arguments parsed from DATABASE_URL"""
+    return dict(_parse_mysql_url(DATABASE_URL))
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_mysql_url(url):
+    """Parse a mysql:// URL once; _mysql_params() hands out copies"""
+    u = urlparse(url)
+    return dict(
+        host=u.hostname or "localhost",
+        user=u.username or "root",
+        password=u.password or "",
+        database=u.path.lstrip('/') or "contract_analysis",
+        port=u.port or 3306,
+        charset="utf8mb4",
+        cursorclass=pymysql.cursors.DictCursor,
+        # plain reads must not hold a REPEATABLE READ snapshot open on the reused
+        # connection; writes go through transaction(), which calls begin()
+        autocommit=True
+    )
+
+
+def _mysql_pool():
+    """Create the MySQL connection pool on first use"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            # ping=1 checks a connection whenever it is handed out of the pool
+            _POOL = PooledDB(creator=pymysql, mincached=2, maxcached=10, maxconnections=20,
+                             blocking=True, ping=1, **_mysql_params())
+            logger.debug("MySQL connection pool created")
+    return _POOL
+
+
 def get_conn():
     """Get database connection - works for both SQLite and MySQL"""
-    print(f"DEBUG: Connecting to database: {DATABASE_URL}")
+    conn = getattr(_TLS, "conn", None)
+    if conn is not None:
+        if not is_mysql():
+            if conn.in_transaction:
+                conn.rollback()  # a helper failed before committing; don't inherit its writes
+        elif PooledDB is None:
+            conn.ping(reconnect=True)  # bare pymysql has no failover of its own
+        # Pooled MySQL connections need no check here: DBUtils reopens a lost
+        # connection and retries when a statement fails outside a transaction
+        return conn
+
+    logger.debug("Connecting to database: %s", DATABASE_URL)
 
     # ---------- SQLITE ----------
     if DATABASE_URL.startswith("sqlite"):
         path = DATABASE_URL.replace("sqlite:///", "")
         conn = sqlite3.connect(path, check_same_thread=False)
         conn.row_factory = sqlite3.Row  # Enable dict-like access
-        print("DEBUG: SQLite connection established")
+        conn.execute("PRAGMA foreign_keys = ON")  # SQLite enforces ON DELETE CASCADE only when enabled
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        logger.debug("SQLite connection established")
+        _TLS.conn = conn
         return conn
 
     # ---------- MYSQL ----------
     try:
-        u = urlparse(DATABASE_URL)
-        
-        conn = pymysql.connect(
-            host=u.hostname or "localhost",
-            user=u.username or "root",
-            password=u.password or "",
-            database=u.path.lstrip('/') or "contract_analysis",
-            port=u.port or 3306,
-            charset="utf8mb4",
-            cursorclass=pymysql.cursors.DictCursor
-        )
-        print("DEBUG: MySQL connection established")
+        if PooledDB is not None:
+            conn = _mysql_pool().connection()
+        else:
+            conn = pymysql.connect(**_mysql_params())
+        logger.debug("MySQL connection established")
+        _TLS.conn = conn
         return conn
     except Exception as e:
         raise RuntimeError(f"MySQL connection failed: {str(e)}")
 
 
+@contextmanager
+def transaction():
+    """
+    Cursor on the thread's connection inside one transaction:
+    commits when the block finishes, rolls back and re-raises on error.
+    """
+    conn = get_conn()
+    if is_mysql():
+        conn.begin()
+    cur = conn.cursor()
+    try:
+        yield cur
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
 # ============================================================
 # Database Schema
 # ============================================================
@@ -112,10 +242,23 @@ SQLITE_SCHEMA = [
         clause_number INTEGER,
         model TEXT,
         vector_json TEXT,
+        vector_blob BLOB,
+        dim INTEGER,
+        dtype INTEGER,
         created_at TEXT,
         FOREIGN KEY(analysis_id) REFERENCES analyses(id) ON DELETE CASCADE
     )
+    """,
     """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        name TEXT PRIMARY KEY,
+        applied_at TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_embeddings_analysis_clause ON embeddings(analysis_id, clause_number)",
+    "CREATE INDEX IF NOT EXISTS idx_clauses_analysis_clause ON clauses(analysis_id, clause_number)",
+    # Covers list_analyses(owner_id): filter, ORDER BY created_at and every selected column
+    "CREATE INDEX IF NOT EXISTS idx_analyses_owner_created ON analyses(owner_id, created_at, name, language, total_clauses)"
 ]
 
 MYSQL_SCHEMA = [
@@ -123,7 +266,7 @@ MYSQL_SCHEMA = [
     CREATE TABLE IF NOT EXISTS analyses (
         id INT PRIMARY KEY AUTO_INCREMENT,
         name VARCHAR(255),
-        created_at VARCHAR(50),
+        created_at DATETIME(6),
         language VARCHAR(50),
         total_clauses INT,
         raw_text MEDIUMTEXT,
@@ -149,7 +292,7 @@ MYSQL_SCHEMA = [
         id INT PRIMARY KEY AUTO_INCREMENT,
         email VARCHAR(255) UNIQUE NOT NULL,
         password_hash VARCHAR(255),
-        created_at VARCHAR(50),
+        created_at DATETIME(6),
         is_admin TINYINT DEFAULT 0
     )
     """,
@@ -160,10 +303,24 @@ MYSQL_SCHEMA = [
         clause_number INT,
         model VARCHAR(100),
         vector_json TEXT,
-        created_at VARCHAR(50),
+        vector_blob MEDIUMBLOB,
+        dim SMALLINT UNSIGNED,
+        dtype TINYINT UNSIGNED,
+        created_at DATETIME(6),
         FOREIGN KEY (analysis_id) REFERENCES analyses(id) ON DELETE CASCADE
     )
+    """,
     """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        name VARCHAR(100) PRIMARY KEY,
+        applied_at DATETIME(6)
+    )
+    """,
+    # MySQL has no CREATE INDEX IF NOT EXISTS; init_db() skips ER_DUP_KEYNAME on later runs
+    "CREATE INDEX idx_embeddings_analysis_clause ON embeddings(analysis_id, clause_number)",
+    "CREATE INDEX idx_clauses_analysis_clause ON clauses(analysis_id, clause_number)",
+    # Covers list_analyses(owner_id): filter, ORDER BY created_at and every selected column
+    "CREATE INDEX idx_analyses_owner_created ON analyses(owner_id, created_at, name, language, total_clauses)"
 ]
 
 
@@ -171,6 +328,10 @@ MYSQL_SCHEMA = [
 # Initialize Database
 # ============================================================
 
+# MySQL error code for CREATE INDEX on an index name that already exists
+MYSQL_ER_DUP_KEYNAME = 1061
+
+
 def init_db():
     """Create tables if they don't exist"""
     conn = get_conn()
@@ -181,28 +342,87 @@ def init_db():
     for stmt in schema:
         try:
             cur.execute(stmt)
-            print(f"DEBUG: Schema statement executed successfully")
+            logger.debug("Schema statement executed successfully")
         except Exception as e:
-            print(f"WARNING: Schema execution warning: {e}")
+            if is_mysql() and e.args and e.args[0] == MYSQL_ER_DUP_KEYNAME:
+                logger.debug("Index already exists, skipped")
+                continue
+            logger.warning("Schema execution warning: %s", e)
 
     conn.commit()
-    conn.close()
-    print("DEBUG: Database initialized successfully")
+    logger.debug("Database initialized successfully")
+
+
+def _migration_applied(cur, name: str) -> bool:
+    cur.execute(q("SELECT 1 FROM schema_migrations WHERE name = %s"), (name,))
+    return cur.fetchone() is not None
+
+
+def _mark_migration(cur, name: str):
+    cur.execute(q("INSERT INTO schema_migrations (name, applied_at) VALUES (%s, %s)"), (name, _utcnow()))
+
+
+def _migrate_json_embeddings(cur):
+    """
+    One-shot rewrite of legacy vector_json rows into packed vector_blob rows.
+    Recorded in schema_migrations, so the unindexed scan runs only once per database;
+    new rows are written as blobs and never need it.
+    """
+    if _migration_applied(cur, "embeddings_json_to_blob"):
+        return
+
+    cur.execute("SELECT id, vector_json FROM embeddings WHERE vector_blob IS NULL AND vector_json IS NOT NULL")
+    rows = []
+    for row in cur.fetchall():
+        vec = np.asarray(json.loads(row['vector_json']), dtype=np.float32)
+        rows.append((vec.tobytes(), vec.size, EMBEDDING_DTYPE_FLOAT32, row['id']))
+
+    if rows:
+        cur.executemany(q(
+            "UPDATE embeddings SET vector_blob = %s, dim = %s, dtype = %s, vector_json = NULL WHERE id = %s"
+        ), rows)
+        logger.debug("Migrated %s JSON embeddings to float32 blobs", len(rows))
+
+    _mark_migration(cur, "embeddings_json_to_blob")
+
+
+def _migrate_created_at_datetime(cur):
+    """MySQL only: turn legacy VARCHAR ISO created_at columns into DATETIME(6)"""
+    for table in ("analyses", "users", "embeddings"):
+        cur.execute(f"SHOW COLUMNS FROM {table} LIKE 'created_at'")
+        col = cur.fetchone()
+        if not col or not col["Type"].lower().startswith("varchar"):
+            continue
+        # isoformat() uses a 'T' separator; normalise before the type change
+        cur.execute(f"UPDATE {table} SET created_at = REPLACE(created_at, 'T', ' ') WHERE created_at LIKE '%T%'")
+        cur.execute(f"ALTER TABLE {table} MODIFY COLUMN created_at DATETIME(6)")
+        logger.debug("Converted %s.created_at to DATETIME(6) (MySQL)", table)
 
 
 def ensure_migrations():
     """
     Run any necessary schema migrations.
-    For MySQL: schema is already correct via init_db()
+    For MySQL: adds columns introduced after the initial schema
     For SQLite: checks and adds missing columns if needed
     """
-    if is_mysql():
-        return  # MySQL schema is already correct
-    
-    # SQLite-only migrations
     conn = get_conn()
     cur = conn.cursor()
+
+    if is_mysql():
+        try:
+            for col, col_type in (("vector_blob", "MEDIUMBLOB"), ("dim", "SMALLINT UNSIGNED"), ("dtype", "TINYINT UNSIGNED")):
+                cur.execute(f"SHOW COLUMNS FROM embeddings LIKE '{col}'")
+                if not cur.fetchone():
+                    cur.execute(f"ALTER TABLE embeddings ADD COLUMN {col} {col_type}")
+                    logger.debug("Added '%s' column to embeddings table (MySQL)", col)
+            _migrate_json_embeddings(cur)
+            _migrate_created_at_datetime(cur)
+            conn.commit()
+        except Exception as e:
+            logger.warning("Migration check failed: %s", e)
+        return
     
+    # SQLite migrations
     try:
         # Check if 'is_admin' column exists in users table
         cur.execute("PRAGMA table_info(users)")
@@ -213,84 +433,144 @@ def ensure_migrations():
         
         if 'is_admin' not in column_names:
             cur.execute("ALTER TABLE users ADD COLUMN is_admin INTEGER DEFAULT 0")
-            print("DEBUG: Added 'is_admin' column to users table (SQLite)")
+            logger.debug("Added 'is_admin' column to users table (SQLite)")
+
+        # Check if 'vector_blob' column exists in embeddings table
+        cur.execute("PRAGMA table_info(embeddings)")
+        column_names = [col['name'] if isinstance(col, dict) else col[1] for col in cur.fetchall()]
+
+        for col, col_type in (("vector_blob", "BLOB"), ("dim", "INTEGER"), ("dtype", "INTEGER")):
+            if col not in column_names:
+                cur.execute(f"ALTER TABLE embeddings ADD COLUMN {col} {col_type}")
+                logger.debug("Added '%s' column to embeddings table (SQLite)", col)
+
+        _migrate_json_embeddings(cur)
         
         conn.commit()
-        print("DEBUG: SQLite migrations completed")
+        logger.debug("SQLite migrations completed")
         
     except Exception as e:
-        print(f"WARNING: Migration check failed: {e}")
-    finally:
-        conn.close()
+        logger.warning("Migration check failed: %s", e)
 
 
 # ============================================================
 # User Management
 # ============================================================
 
+# Short-lived cache of user rows keyed by the exact email string, so the login
+# flow's repeated lookups skip the SELECT. Only found users are cached; any user
+# write clears it. Without cachetools every lookup goes to the database.
+_USER_CACHE = TTLCache(maxsize=4096, ttl=60) if TTLCache is not None else None
+_USER_CACHE_LOCK = threading.RLock()
+
+
+def clear_user_cache():
+    """Drop all cached user rows"""
+    if _USER_CACHE is not None:
+        with _USER_CACHE_LOCK:
+            _USER_CACHE.clear()
+
+
+def _hash_password(password: str) -> str:
+    """Hash a password with the configured method"""
+    if PW_HASH_METHOD:
+        return generate_password_hash(password, method=PW_HASH_METHOD)
+    if _PH is not None:
+        return _PH.hash(password)
+    return generate_password_hash(password)
+
+
+def _check_password(pw_hash: str, password: str) -> tuple[bool, bool]:
+    """Check a password against a stored hash; returns (matches, needs_rehash)"""
+    if pw_hash.startswith("$argon2"):
+        if _PH is None:
+            return False, False
+        try:
+            _PH.verify(pw_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False, False
+        return True, not PW_HASH_METHOD and _PH.check_needs_rehash(pw_hash)
+
+    # werkzeug (pbkdf2/scrypt) hashes; move them to argon2 when that's the default
+    if not check_password_hash(pw_hash, password):
+        return False, False
+    return True, not PW_HASH_METHOD and _PH is not None
+
+
 def register_user(email: str, password: str) -> tuple[bool, str]:
     """Register a new user"""
-    conn = get_conn()
-    cur = conn.cursor()
-
-    pw_hash = generate_password_hash(password)
-    created_at = datetime.utcnow().isoformat()
+    pw_hash = _hash_password(password)
+    created_at = _utcnow()
 
     try:
-        cur.execute(q(
-            "INSERT INTO users (email, password_hash, created_at, is_admin) VALUES (%s, %s, %s, 0)"
-        ), (email, pw_hash, created_at))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute(q(
+                "INSERT INTO users (email, password_hash, created_at, is_admin) VALUES (%s, %s, %s, 0)"
+            ), (email, pw_hash, created_at))
+        clear_user_cache()
         return True, "Registration successful. You can now log in."
     except Exception as e:
-        conn.rollback()
         return False, f"Registration failed: {str(e)}"
-    finally:
-        conn.close()
 
 
 def verify_user(email: str, password: str) -> Optional[int]:
     """Verify user credentials and return user ID"""
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute(q("SELECT id, password_hash FROM users WHERE email = %s"), (email,))
-    row = cur.fetchone()
-    conn.close()
+    user = get_user_by_email(email)
 
-    if not row:
+    if not user:
         return None
 
-    # Handle both dict (MySQL) and Row (SQLite) objects
-    user_id = row["id"] if isinstance(row, dict) else row[0]
-    pw_hash = row["password_hash"] if isinstance(row, dict) else row[1]
+    ok, needs_rehash = _check_password(user["password_hash"], password)
+    if not ok:
+        return None
 
-    if check_password_hash(pw_hash, password):
-        return user_id
+    if needs_rehash:
+        # Upgrade the stored hash now that the plain password is at hand; best effort,
+        # a failed write (locked or read-only database) must not fail the login
+        try:
+            with transaction() as cur:
+                cur.execute(q("UPDATE users SET password_hash = %s WHERE id = %s"),
+                            (_hash_password(password), user["id"]))
+            clear_user_cache()
+        except Exception as e:
+            logger.error("Password rehash failed for user %s: %s", user["id"], e)
 
-    return None
+    return user["id"]
 
 
 def get_user_by_email(email: str) -> Optional[Dict]:
     """Get user details by email"""
+    if _USER_CACHE is not None:
+        with _USER_CACHE_LOCK:
+            cached = _USER_CACHE.get(email)
+        if cached is not None:
+            return dict(cached)
+
     conn = get_conn()
     cur = conn.cursor()
     
     cur.execute(q("SELECT id, email, password_hash, is_admin FROM users WHERE email = %s"), (email,))
     user = cur.fetchone()
-    conn.close()
     
     if user:
         # Convert to dict if it's a Row object
         if not isinstance(user, dict):
             user = dict(user)
+
+        if _USER_CACHE is not None:
+            with _USER_CACHE_LOCK:
+                _USER_CACHE[email] = dict(user)
     
     return user
 
 
 def user_exists(email: str) -> bool:
     """Check if user exists"""
-    return get_user_by_email(email) is not None
+    conn = get_conn()
+    cur = conn.cursor()
+
+    cur.execute(q("SELECT 1 FROM users WHERE email = %s LIMIT 1"), (email,))
+    return cur.fetchone() is not None
 
 
 def list_users():
@@ -300,7 +580,6 @@ def list_users():
     
     cur.execute("SELECT id, email, created_at, is_admin FROM users ORDER BY created_at DESC")
     rows = cur.fetchall()
-    conn.close()
     
     # Convert Row objects to dicts for SQLite
     if rows and not isinstance(rows[0], dict):
@@ -311,25 +590,17 @@ def list_users():
 
 def set_user_admin(user_id: int, is_admin: bool):
     """Set admin flag for a user"""
-    conn = get_conn()
-    cur = conn.cursor()
-    
     val = 1 if is_admin else 0
-    cur.execute(q("UPDATE users SET is_admin = %s WHERE id = %s"), (val, user_id))
-    
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute(q("UPDATE users SET is_admin = %s WHERE id = %s"), (val, user_id))
+    clear_user_cache()
 
 
 def delete_user(user_id: int):
     """Delete a user"""
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    cur.execute(q("DELETE FROM users WHERE id = %s"), (user_id,))
-    
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute(q("DELETE FROM users WHERE id = %s"), (user_id,))
+    clear_user_cache()
 
 
 # ============================================================
@@ -337,38 +608,42 @@ def delete_user(user_id: int):
 # ============================================================
 
 def save_analysis(name: str, language: str, raw_text: str, clauses: List[Dict[str, Any]], owner_id: Optional[int] = None):
-    """Save contract analysis"""
-    conn = get_conn()
-    cur = conn.cursor()
-
-    created_at = datetime.utcnow().isoformat()
+    """Save contract analysis (analysis row and all clauses in one transaction)"""
+    created_at = _utcnow()
     total = len(clauses)
 
-    cur.execute(q(
-        "INSERT INTO analyses (name, created_at, language, total_clauses, raw_text, owner_id) "
-        "VALUES (%s, %s, %s, %s, %s, %s)"
-    ), (name, created_at, language, total, raw_text, owner_id))
-
-    analysis_id = cur.lastrowid
-
-    for c in clauses:
+    with transaction() as cur:
         cur.execute(q(
+            "INSERT INTO analyses (name, created_at, language, total_clauses, raw_text, owner_id) "
+            "VALUES (%s, %s, %s, %s, %s, %s)"
+        ), (name, created_at, language, total, raw_text, owner_id))
+
+        analysis_id = cur.lastrowid
+
+        rows = [
+            (
+                analysis_id,
+                c.get("id"),
+                c.get("clause"),
+                c.get("risk"),
+                c.get("reasons"),
+                c.get("classification"),
+                json.dumps(c.get("entities")) if c.get("entities") else None,
+                c.get("comment")
+            )
+            for c in clauses
+        ]
+
+        # Batched statements instead of a round-trip per clause; PyMySQL folds each
+        # batch into one multi-row INSERT, kept under max_allowed_packet by the batch size
+        sql = q(
             "INSERT INTO clauses (analysis_id, clause_number, clause_text, risk, reasons, classification, entities, comment) "
             "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
-        ), (
-            analysis_id,
-            c.get("id"),
-            c.get("clause"),
-            c.get("risk"),
-            c.get("reasons"),
-            c.get("classification"),
-            json.dumps(c.get("entities")) if c.get("entities") else None,
-            c.get("comment")
-        ))
+        )
+        for i in range(0, len(rows), INSERT_BATCH_SIZE):
+            cur.executemany(sql, rows[i:i + INSERT_BATCH_SIZE])
 
-    conn.commit()
-    conn.close()
-    print(f"DEBUG: Saved analysis ID {analysis_id}")
+    logger.debug("Saved analysis ID %s", analysis_id)
     return analysis_id
 
 
@@ -388,126 +663,106 @@ def list_analyses(owner_id: Optional[int] = None):
             "FROM analyses ORDER BY created_at DESC"
         )
 
-    rows = cur.fetchall()
-    conn.close()
-    
-    # Convert Row objects to dicts for SQLite
-    if rows and not isinstance(rows[0], dict):
-        rows = [dict(row) for row in rows]
+    # Convert Row objects to dicts for SQLite, one batch at a time
+    rows = []
+    while True:
+        batch = cur.fetchmany(FETCH_BATCH_SIZE)
+        if not batch:
+            break
+        rows.extend(row if isinstance(row, dict) else dict(row) for row in batch)
     
     return rows
 
 
-def load_analysis(analysis_id: int) -> Optional[Dict[str, Any]]:
-    """Load a saved analysis including all clauses"""
+def load_analysis(analysis_id: int, include_raw: bool = True) -> Optional[Dict[str, Any]]:
+    """Load a saved analysis including all clauses (pass include_raw=False to skip raw_text)"""
     conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute(q(
-        "SELECT id, name, created_at, language, total_clauses, raw_text, owner_id "
-        "FROM analyses WHERE id = %s"
-    ), (analysis_id,))
-    
-    meta = cur.fetchone()
-
-    if not meta:
-        conn.close()
-        return None
-    
-    # Convert to dict if Row object
-    if not isinstance(meta, dict):
-        meta = dict(meta)
-
-    cur.execute(q(
-        "SELECT clause_number, clause_text, risk, reasons, classification, entities, comment "
-        "FROM clauses WHERE analysis_id = %s ORDER BY clause_number"
-    ), (analysis_id,))
-    
-    clauses_rows = cur.fetchall()
-    conn.close()
-    
-    # Convert to dicts if Row objects
-    if clauses_rows and not isinstance(clauses_rows[0], dict):
-        clauses_rows = [dict(row) for row in clauses_rows]
-
-    analysis = {
-        "id": meta['id'],
-        "name": meta['name'],
-        "created_at": meta['created_at'],
-        "language": meta['language'],
-        "total_clauses": meta['total_clauses'],
-        "raw_text": meta['raw_text'],
-        "owner_id": meta['owner_id'],
-        "clauses": []
-    }
-
-    for row in clauses_rows:
-        entities = None
-        if row['entities']:
-            try:
-                entities = json.loads(row['entities'])
-            except json.JSONDecodeError:
-                entities = row['entities']
-
-        analysis["clauses"].append({
-            "id": row['clause_number'],
-            "clause": row['clause_text'],
-            "risk": row['risk'],
-            "reasons": row['reasons'],
-            "classification": row['classification'],
-            "entities": entities,
-            "comment": row['comment'],
-        })
-
-    return analysis
+    # pymysql's DictCursor buffers the whole result client-side; stream it instead.
+    # closing() drains an unbuffered result even on error, so the thread's
+    # connection is never left mid-read for the next helper.
+    cur = conn.cursor(pymysql.cursors.SSDictCursor) if is_mysql() else conn.cursor()
+
+    # One round-trip: the analysis row (row_kind 0, raw_text included once) followed
+    # by its clause rows (row_kind 1); each half is a plain indexed lookup
+    raw_col = "raw_text" if include_raw else "NULL"
+    with closing(cur):
+        cur.execute(q(
+            "SELECT 0 AS row_kind, id, name, created_at, language, total_clauses, owner_id, "
+            + raw_col + " AS raw_text, "
+            "NULL AS clause_number, NULL AS clause_text, NULL AS risk, NULL AS reasons, "
+            "NULL AS classification, NULL AS entities, NULL AS comment "
+            "FROM analyses WHERE id = %s "
+            "UNION ALL "
+            "SELECT 1, NULL, NULL, NULL, NULL, NULL, NULL, NULL, "
+            "clause_number, clause_text, risk, reasons, classification, entities, comment "
+            "FROM clauses WHERE analysis_id = %s "
+            "ORDER BY row_kind, clause_number"
+        ), (analysis_id, analysis_id))
+
+        row = cur.fetchone()
+
+        # Clause rows sort after the analysis row, so none first means no analysis
+        if not row or row['row_kind'] != 0:
+            return None
+
+        # Both sqlite3.Row and pymysql dicts support row['col'], so rows are read in place
+        analysis = {
+            "id": row['id'],
+            "name": row['name'],
+            "created_at": row['created_at'],
+            "language": row['language'],
+            "total_clauses": row['total_clauses'],
+            "raw_text": row['raw_text'],
+            "owner_id": row['owner_id'],
+            "clauses": []
+        }
+
+        batch = cur.fetchmany(FETCH_BATCH_SIZE)
+        while batch:
+            for row in batch:
+                entities = None
+                if row['entities']:
+                    try:
+                        entities = json.loads(row['entities'])
+                    except json.JSONDecodeError:
+                        entities = row['entities']
+
+                analysis["clauses"].append({
+                    "id": row['clause_number'],
+                    "clause": row['clause_text'],
+                    "risk": row['risk'],
+                    "reasons": row['reasons'],
+                    "classification": row['classification'],
+                    "entities": entities,
+                    "comment": row['comment'],
+                })
+
+            batch = cur.fetchmany(FETCH_BATCH_SIZE)
+
+        return analysis
 
 
 def update_clause_comment(analysis_id: int, clause_number: int, comment: str):
     """Update comment for a specific clause"""
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute(q(
-        "UPDATE clauses SET comment = %s WHERE analysis_id = %s AND clause_number = %s"
-    ), (comment, analysis_id, clause_number))
-
-    conn.commit()
-    conn.close()
+    with transaction() as cur:
+        cur.execute(q(
+            "UPDATE clauses SET comment = %s WHERE analysis_id = %s AND clause_number = %s"
+        ), (comment, analysis_id, clause_number))
 
 
 def delete_analysis(analysis_id: int):
     """Delete an analysis and all related data"""
-    conn = get_conn()
-    cur = conn.cursor()
-
     try:
-        # Delete in order to respect foreign keys
-        cur.execute(q("DELETE FROM embeddings WHERE analysis_id = %s"), (analysis_id,))
-        cur.execute(q("DELETE FROM clauses WHERE analysis_id = %s"), (analysis_id,))
-        cur.execute(q("DELETE FROM analyses WHERE id = %s"), (analysis_id,))
-
-        conn.commit()
-
-        # Check if table is empty and reset auto-increment if MySQL
-        if is_mysql():
-            cur.execute("SELECT COUNT(*) AS cnt FROM analyses")
-            count_row = cur.fetchone()
-            count = count_row['cnt'] if count_row else 0
-
-            if count == 0:
-                cur.execute("ALTER TABLE analyses AUTO_INCREMENT = 1")
-                conn.commit()
-                print("DEBUG: Auto-increment reset")
+        # Clauses and embeddings go with the analysis via ON DELETE CASCADE
+        with transaction() as cur:
+            cur.execute(q("DELETE FROM analyses WHERE id = %s"), (analysis_id,))
 
-        print(f"DEBUG: Deleted analysis {analysis_id}")
+        logger.debug("Deleted analysis %s", analysis_id)
         return True
 
     except Exception as e:
-        conn.rollback()
-        print(f"Delete error: {str(e)}")
+        logger.error("Delete error: %s", e)
         raise Exception(f"Database delete error: {str(e)}")
-    finally:
-        conn.close()
 
 
 # ============================================================
@@ -515,44 +770,65 @@ def delete_analysis(analysis_id: int):
 # ============================================================
 
 def save_embedding(analysis_id: int, clause_number: int, model: str, vector: List[float]):
-    """Save embedding vector for a clause"""
-    conn = get_conn()
-    cur = conn.cursor()
+    """Save embedding vector for a clause (packed float32 bytes)"""
+    created_at = _utcnow()
+    vec = np.asarray(vector, dtype=np.float32)
 
-    created_at = datetime.utcnow().isoformat()
-    vec_json = json.dumps(vector)
+    with transaction() as cur:
+        cur.execute(q(
+            "INSERT INTO embeddings (analysis_id, clause_number, model, vector_blob, dim, dtype, created_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+        ), (analysis_id, clause_number, model, vec.tobytes(), vec.size, EMBEDDING_DTYPE_FLOAT32, created_at))
 
-    cur.execute(q(
-        "INSERT INTO embeddings (analysis_id, clause_number, model, vector_json, created_at) "
-        "VALUES (%s, %s, %s, %s, %s)"
-    ), (analysis_id, clause_number, model, vec_json, created_at))
 
-    conn.commit()
-    conn.close()
+def save_embeddings_batch(analysis_id: int, model: str, vectors, clause_numbers: Optional[List[int]] = None):
+    """
+    Save one embedding per clause in a single transaction.
+    vectors is a list of vectors or a 2-D array; clause_numbers defaults to 1..N.
+    """
+    arr = np.asarray(vectors, dtype=np.float32)
+    if arr.ndim != 2 or not len(arr):
+        return
+
+    if clause_numbers is None:
+        clause_numbers = range(1, len(arr) + 1)
+
+    created_at = _utcnow()
+    dim = arr.shape[1]
+    rows = [
+        (analysis_id, int(n), model, vec.tobytes(), dim, EMBEDDING_DTYPE_FLOAT32, created_at)
+        for n, vec in zip(clause_numbers, arr)
+    ]
+
+    sql = q(
+        "INSERT INTO embeddings (analysis_id, clause_number, model, vector_blob, dim, dtype, created_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+    )
+    with transaction() as cur:
+        for i in range(0, len(rows), INSERT_BATCH_SIZE):
+            cur.executemany(sql, rows[i:i + INSERT_BATCH_SIZE])
 
 
 def get_embeddings(analysis_id: int):
-    """Retrieve all embeddings for an analysis"""
+    """Retrieve all embeddings for an analysis as (clause_number, model, float32 ndarray)"""
     conn = get_conn()
     cur = conn.cursor()
 
     cur.execute(q(
-        "SELECT clause_number, model, vector_json FROM embeddings "
+        "SELECT clause_number, model, vector_blob, dtype, vector_json FROM embeddings "
         "WHERE analysis_id = %s ORDER BY clause_number"
     ), (analysis_id,))
 
-    rows = cur.fetchall()
-    conn.close()
-    
-    # Convert to dicts if Row objects
-    if rows and not isinstance(rows[0], dict):
-        rows = [dict(row) for row in rows]
-
+    # sqlite3.Row and pymysql dicts both support row['col']; no per-row dict copy needed
     results = []
-    for row in rows:
+    for row in cur.fetchall():
         clause_number = row['clause_number']
         model = row['model']
-        vec = json.loads(row['vector_json'] or '[]')
+        if row['vector_blob'] is not None:
+            vec = np.frombuffer(row['vector_blob'], dtype=EMBEDDING_DTYPES[row['dtype'] or EMBEDDING_DTYPE_FLOAT32])
+        else:
+            # Rows saved before vectors were packed as float32
+            vec = np.asarray(json.loads(row['vector_json'] or '[]'), dtype=np.float32)
         results.append((clause_number, model, vec))
 
     return results
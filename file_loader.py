@@ -1,6 +1,55 @@
 # file_loader.py
-from typing import Optional
-from io import BytesIO
+from typing import List, Optional
+from io import TextIOWrapper
+
+
+def _pdf_pages_pdfium(source) -> List[str]:
+    """Page texts via PDFium's native extractor (source: bytes or binary file object)"""
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(source)
+    pages = []
+    try:
+        for page in pdf:
+            textpage = page.get_textpage()
+            text = textpage.get_text_range()
+            textpage.close()
+            page.close()
+            if text and text.strip():
+                pages.append(text.strip())
+    finally:
+        pdf.close()
+    return pages
+
+
+def _pdf_pages_pypdf2(source) -> List[str]:
+    """Page texts via PyPDF2 (pure Python fallback; source: binary file object)"""
+    from PyPDF2 import PdfReader
+
+    reader = PdfReader(source)
+
+    pages = []
+    for page in reader.pages:
+        try:
+            text = page.extract_text()
+            if text and text.strip():
+                pages.append(text.strip())
+        except Exception:
+            continue
+    return pages
+
+
+def _read_text(uploaded_file) -> str:
+    """
+    Decode the upload straight from its buffer (no intermediate bytes copy).
+    newline="" keeps line endings exactly as uploaded.
+    """
+    uploaded_file.seek(0)
+    wrapper = TextIOWrapper(uploaded_file, encoding="utf-8", errors="ignore", newline="")
+    try:
+        return wrapper.read()
+    finally:
+        wrapper.detach()  # leave the upload open for Streamlit
 
 
 def load_contract_text(uploaded_file) -> Optional[str]:
@@ -17,24 +66,19 @@ def load_contract_text(uploaded_file) -> Optional[str]:
     try:
         # ---------- TXT ----------
         if name.endswith(".txt"):
-            content = uploaded_file.getvalue().decode("utf-8", errors="ignore")
+            content = _read_text(uploaded_file)
             return content.strip() if content else None
 
         # ---------- PDF ----------
         elif name.endswith(".pdf"):
-            from PyPDF2 import PdfReader
-
-            data = uploaded_file.read()
-            reader = PdfReader(BytesIO(data))
-
-            pages = []
-            for page in reader.pages:
-                try:
-                    text = page.extract_text()
-                    if text and text.strip():
-                        pages.append(text.strip())
-                except Exception:
-                    continue
+            # Parsers read the upload directly instead of a read() + BytesIO copy
+            uploaded_file.seek(0)
+            try:
+                pages = _pdf_pages_pdfium(uploaded_file)
+            except Exception:
+                # pypdfium2 missing or refused the file
+                uploaded_file.seek(0)
+                pages = _pdf_pages_pypdf2(uploaded_file)
 
             full_text = "\n\n".join(pages)
             return full_text if full_text else None
@@ -43,20 +87,20 @@ def load_contract_text(uploaded_file) -> Optional[str]:
         elif name.endswith(".docx"):
             import docx
 
-            data = uploaded_file.read()
-            doc = docx.Document(BytesIO(data))
+            uploaded_file.seek(0)
+            doc = docx.Document(uploaded_file)
 
-            paragraphs = []
-            for p in doc.paragraphs:
-                if p.text and p.text.strip():
-                    paragraphs.append(p.text.strip())
+            # paragraph.text maps <w:tab/> to "\t" and <w:br/>/<w:cr/> to "\n";
+            # read it once per paragraph
+            texts = (p.text.strip() for p in doc.paragraphs)
+            paragraphs = [t for t in texts if t]
 
             full_text = "\n\n".join(paragraphs)
             return full_text if full_text else None
 
         # ---------- FALLBACK ----------
         else:
-            content = uploaded_file.getvalue().decode("utf-8", errors="ignore")
+            content = _read_text(uploaded_file)
             return content.strip() if content else None
 
     except Exception:
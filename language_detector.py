@@ -1,6 +1,9 @@
 # language_detector.py
+from collections import OrderedDict
 from typing import Optional
+import hashlib
 import re
+import threading
 
 # -----------------------------
 # Optional dependencies
@@ -12,9 +15,29 @@ except Exception:
 
 try:
     from googletrans import Translator
-    _translator = Translator()
 except Exception:
-    _translator = None
+    Translator = None
+
+# The translator is created on first use (False = unavailable). The module global
+# outlives Streamlit reruns and sessions, so it is built once per process; the lock
+# stops concurrent sessions from building it twice.
+_translator = None
+_INIT_LOCK = threading.Lock()
+
+# langdetect results keyed by a 16-byte digest of the full text, so the cache
+# never holds whole contracts alive
+_DETECT_CACHE_SIZE = 1024
+_DETECT_CACHE: "OrderedDict[bytes, str]" = OrderedDict()
+_DETECT_LOCK = threading.Lock()
+
+
+# -----------------------------
+# Precompiled patterns
+# -----------------------------
+_RE_DEVANAGARI = re.compile(r'[\u0900-\u097F]')
+_RE_LATIN = re.compile(r'[A-Za-z]')
+_RE_NON_HINDI = re.compile(r'[^\u0900-\u097F\s]')
+_RE_NON_WORD = re.compile(r'[^\w\s]')
 
 
 # -----------------------------
@@ -29,26 +52,69 @@ def detect_language(text: str) -> str:
     if not text or len(text.strip()) == 0:
         return "unknown"
 
-    # 1️⃣ Try langdetect (best)
-    if detect:
-        try:
-            lang = detect(text)
-            if lang:
-                return lang
-        except Exception:
-            pass
-
-    # 2️⃣ Fallback — Hindi Unicode detection
-    if re.search(r'[\u0900-\u097F]', text):
+    # Plain ASCII can't be Hindi; skip the n-gram model (same label each path below would use).
+    # str.isascii() is O(1) in CPython: strings record their widest code point.
+    if text.isascii():
+        return "en" if detect else "english"
+
+    # Devanagari with no Latin letters at all is Hindi for this app's purposes
+    if _RE_DEVANAGARI.search(text) and not _RE_LATIN.search(text):
+        return "hi" if detect else "hindi"
+
+    lang = _detect_cached(text) if detect else None
+    if lang:
+        return lang
+
+    # Fallback — Hindi Unicode detection over the whole text
+    if _RE_DEVANAGARI.search(text):
         return "hindi"
 
-    # 3️⃣ Default
+    # Default
     return "english"
 
 
+def _detect_cached(text: str) -> Optional[str]:
+    """
+    Memoized langdetect result, so a clause or contract that is re-processed
+    (save, reload, summary) runs langdetect only once.
+    None when langdetect fails (not cached).
+    """
+    key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    with _DETECT_LOCK:
+        lang = _DETECT_CACHE.get(key)
+        if lang is not None:
+            _DETECT_CACHE.move_to_end(key)
+            return lang
+
+    try:
+        lang = detect(text)
+    except Exception:
+        return None
+    if not lang:
+        return None
+
+    with _DETECT_LOCK:
+        _DETECT_CACHE[key] = lang
+        if len(_DETECT_CACHE) > _DETECT_CACHE_SIZE:
+            _DETECT_CACHE.popitem(last=False)
+    return lang
+
+
 # -----------------------------
 # Normalize text to English
 # -----------------------------
+def _get_translator():
+    global _translator
+    if _translator is None:
+        with _INIT_LOCK:
+            if _translator is None:
+                try:
+                    _translator = Translator()
+                except Exception:
+                    _translator = False
+    return _translator
+
+
 def normalize_to_english(text: str) -> str:
     """
     If Hindi detected and googletrans available, translate to English.
@@ -64,13 +130,16 @@ def normalize_to_english(text: str) -> str:
 
     lang = detect_language(text)
 
-    # translate Hindi → English
-    if lang.startswith("hindi") and _translator:
-        try:
-            translated = _translator.translate(text, src="hi", dest="en")
-            return translated.text if translated and translated.text else text
-        except Exception:
-            return text
+    # translate Hindi → English. Only the fallback detector says "hindi";
+    # langdetect reports "hi", so with langdetect installed the text is left as is.
+    if lang.startswith("hindi"):
+        translator = _get_translator() if Translator else False
+        if translator:
+            try:
+                translated = translator.translate(text, src="hi", dest="en")
+                return translated.text if translated and translated.text else text
+            except Exception:
+                return text
 
     return text
 
@@ -82,29 +151,34 @@ def clean_hindi(text: str) -> str:
     """
     Remove punctuation + normalize Hindi text.
     """
-    text = text.lower()
-    text = re.sub(r'[^\u0900-\u097F\s]', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+    return _clean_hindi_lower(text.lower())
 
 
 def clean_english(text: str) -> str:
     """
     Remove punctuation + normalize English text.
     """
-    text = text.lower()
-    text = re.sub(r'[^\w\s]', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+    return _clean_english_lower(text.lower())
+
+
+# " ".join(text.split()) collapses runs of whitespace and trims the ends in one
+# C-level pass; str.split() uses the same Unicode whitespace set as regex \s.
+def _clean_hindi_lower(text: str) -> str:
+    return " ".join(_RE_NON_HINDI.sub(' ', text).split())
+
+
+def _clean_english_lower(text: str) -> str:
+    return " ".join(_RE_NON_WORD.sub(' ', text).split())
 
 
-def normalize_text(text: str) -> str:
+def normalize_text(text: str, lowered: bool = False) -> str:
     """
     Auto normalize based on language.
+    Pass lowered=True when text is already lowercase to skip a second lower().
     """
     lang = detect_language(text)
 
     if lang.startswith("hindi"):
-        return clean_hindi(text)
+        return _clean_hindi_lower(text if lowered else text.lower())
     else:
-        return clean_english(text)
+        return _clean_english_lower(text if lowered else text.lower())
@@ -4,23 +4,53 @@
 import re
 from typing import Dict, List
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# ---------- PRECOMPILED PATTERNS ----------
+
+_RE_NON_HINDI = re.compile(r'[^\u0900-\u097F\s0-9]')
+_RE_NON_ENGLISH = re.compile(r'[^a-z0-9\s]')
+_RE_DEVANAGARI = re.compile(r'[\u0900-\u097F]')
+_RE_LATIN_LOWER = re.compile(r'[a-z]')
+_RE_CLAUSE_SPLIT = re.compile(r"\n\s*(?:\d+\.|clause\s+\d+|section\s+\d+)\s*", re.IGNORECASE)
+
+
+def _build_automaton(values: Dict[str, object]):
+    """Aho-Corasick automaton mapping each keyword to its value; None without pyahocorasick"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for k, v in values.items():
+        automaton.add_word(k, v)
+    automaton.make_automaton()
+    return automaton
+
+
 # ---------- CLEANING ----------
 
 def clean_hindi(text: str) -> str:
-    text = text.lower()
-    text = re.sub(r'[^\u0900-\u097F\s0-9]', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+    return _clean_hindi_lower(text.lower())
 
 
 def clean_english(text: str) -> str:
-    text = text.lower()
-    text = re.sub(r'[^a-z0-9\s]', ' ', text)
-    return re.sub(r'\s+', ' ', text).strip()
+    return _clean_english_lower(text.lower())
+
+
+# " ".join(text.split()) collapses runs of whitespace and trims the ends in one
+# C-level pass; str.split() uses the same Unicode whitespace set as regex \s.
+def _clean_hindi_lower(text: str) -> str:
+    return " ".join(_RE_NON_HINDI.sub(' ', text).split())
+
+
+def _clean_english_lower(text: str) -> str:
+    return " ".join(_RE_NON_ENGLISH.sub(' ', text).split())
 
 
 def is_hindi(text: str) -> bool:
-    return bool(re.search(r'[\u0900-\u097F]', text))
+    return bool(_RE_DEVANAGARI.search(text))
 
 
 def normalize_text(text: str) -> str:
@@ -33,6 +63,30 @@ def normalize_text(text: str) -> str:
 
 # ---------- CONTRACT DETECTION ----------
 
+HINDI_CONTRACT_KEYWORDS = [
+    "समझौता", "अनुबंध", "दायित्व", "भुगतान",
+    "समाप्ति", "क्षतिपूर्ति", "विवाद", "पक्ष"
+]
+
+ENGLISH_CONTRACT_KEYWORDS = [
+    "agreement", "liability", "termination",
+    "indemnity", "payment", "party", "breach"
+]
+
+# One automaton (or, without pyahocorasick, one lookahead alternation) for both
+# languages; either reports every occurrence in a single left-to-right pass
+_CONTRACT_AC = _build_automaton({k: k for k in HINDI_CONTRACT_KEYWORDS + ENGLISH_CONTRACT_KEYWORDS})
+_RE_CONTRACT_KW = re.compile(
+    "(?=(" + "|".join(re.escape(k) for k in HINDI_CONTRACT_KEYWORDS + ENGLISH_CONTRACT_KEYWORDS) + "))"
+)
+
+
+def _contract_hits(text: str):
+    if _CONTRACT_AC is not None:
+        return (kw for _, kw in _CONTRACT_AC.iter(text))
+    return (m.group(1) for m in _RE_CONTRACT_KW.finditer(text))
+
+
 def looks_like_contract(text: str) -> bool:
     """
     Detect whether uploaded file is likely a contract.
@@ -44,27 +98,14 @@ def looks_like_contract(text: str) -> bool:
 
     text_norm = normalize_text(text)
 
-    hindi_keywords = [
-        "समझौता", "अनुबंध", "दायित्व", "भुगतान",
-        "समाप्ति", "क्षतिपूर्ति", "विवाद", "पक्ष"
-    ]
-
-    english_keywords = [
-        "agreement", "liability", "termination",
-        "indemnity", "payment", "party", "breach"
-    ]
-
-    score = 0
-
-    for kw in hindi_keywords:
-        if kw in text_norm:
-            score += 1
+    # Two distinct keywords settle it; stop scanning as soon as they are seen
+    seen = set()
+    for kw in _contract_hits(text_norm):
+        seen.add(kw)
+        if len(seen) >= 2:
+            return True
 
-    for kw in english_keywords:
-        if kw in text_norm:
-            score += 1
-
-    return score >= 2
+    return False
 
 
 # ---------- CLAUSE SPLITTING ----------
@@ -77,15 +118,108 @@ def split_clauses(text: str) -> List[str]:
     if not text:
         return []
 
-    clauses = re.split(r"\n\s*(?:\d+\.|clause\s+\d+|section\s+\d+)\s*", text, flags=re.IGNORECASE)
+    clauses = _RE_CLAUSE_SPLIT.split(text)
     return [c.strip() for c in clauses if len(c.strip()) > 40]
 
 
 # ---------- RISK ANALYSIS ----------
 
-def analyze_risk(clause: str) -> Dict:
+# Every term the rules below test for, per cleaned text. Each term owns one bit;
+# a clause is scanned once per language and the hits are OR-ed into a mask.
+HINDI_RISK_TERMS = [
+    "असीमित", "दायित्व", "क्षतिपूर्ति", "एकतरफा", "बिना", "सूचना", "भुगतान", "रोक",
+    "अस्वीकृत", "दावा", "परित्याग", "नहीं", "गोपनीय", "विवाद"
+]
+
+ENGLISH_RISK_TERMS = [
+    "unlimited liability", "indemnify", "terminate at any time", "without notice",
+    "penalty", "breach", "confidential", "dispute"
+]
+
+_HI = {k: 1 << i for i, k in enumerate(HINDI_RISK_TERMS)}
+_EN = {k: 1 << i for i, k in enumerate(ENGLISH_RISK_TERMS)}
+
+
+_HI_AC = _build_automaton(_HI)
+_EN_AC = _build_automaton(_EN)
+
+# Fallback without pyahocorasick. No term is a prefix of another, so a lookahead
+# alternation reports every term present in a single pass.
+_RE_HI_RISK = re.compile("(?=(" + "|".join(re.escape(k) for k in HINDI_RISK_TERMS) + "))")
+_RE_EN_RISK = re.compile("(?=(" + "|".join(re.escape(k) for k in ENGLISH_RISK_TERMS) + "))")
+
+
+def _term_mask(automaton, pattern: re.Pattern, bits: Dict[str, int], text: str) -> int:
+    mask = 0
+    if automaton is not None:
+        for _, bit in automaton.iter(text):
+            mask |= bit
+    else:
+        for m in pattern.finditer(text):
+            mask |= bits[m.group(1)]
+    return mask
+
+
+# Rules: (language, all-of mask, any-of mask or 0, score, reason). A rule fires when
+# every "all" bit is set and, if given, at least one "any" bit.
+HI, EN = 0, 1
+
+_HIGH_RULES_HI = [
+    (HI, _HI["असीमित"] | _HI["दायित्व"], 0, 4, "असीमित दायित्व"),
+    (HI, _HI["क्षतिपूर्ति"], 0, 4, "पूर्ण क्षतिपूर्ति"),
+    (HI, _HI["एकतरफा"], _HI["बिना"] | _HI["सूचना"], 4, "एकतरफा समाप्ति"),
+    (HI, _HI["भुगतान"], _HI["रोक"] | _HI["अस्वीकृत"], 4, "भुगतान रोका जाना"),
+    (HI, _HI["दावा"], _HI["परित्याग"] | _HI["नहीं"], 4, "भविष्य के दावों का परित्याग"),
+]
+
+_HIGH_RULES_EN = [
+    (EN, _EN["unlimited liability"], 0, 4, "Unlimited liability"),
+    (EN, _EN["indemnify"], 0, 4, "Broad indemnity obligation"),
+    (EN, _EN["terminate at any time"], 0, 4, "Unilateral termination"),
+    (EN, _EN["without notice"], 0, 3, "Termination without notice"),
+    (EN, _EN["penalty"] | _EN["breach"], 0, 3, "Penalty on breach"),
+]
+
+_MEDIUM_RULES = [
+    (HI, _HI["गोपनीय"], 0, 2, "गोपनीयता दायित्व"),
+    (EN, _EN["confidential"], 0, 2, "Confidentiality obligation"),
+    (HI, _HI["विवाद"], 0, 2, "विवाद समाधान क्लॉज"),
+    (EN, _EN["dispute"], 0, 2, "Dispute resolution clause"),
+]
+
+
+def _apply_rules(rules, masks, risk_score: int, reasons: List[str]) -> int:
+    for lang, need, any_of, score, reason in rules:
+        mask = masks[lang]
+        if mask & need == need and (not any_of or mask & any_of):
+            risk_score += score
+            reasons.append(reason)
+    return risk_score
+
+
+# Score → level table: scores 0-2 Low, 3-5 Medium, HIGH_THRESHOLD and up High
+MEDIUM_THRESHOLD = 3
+HIGH_THRESHOLD = 6
+_LEVELS = ["Low"] * MEDIUM_THRESHOLD + ["Medium"] * (HIGH_THRESHOLD - MEDIUM_THRESHOLD) + ["High"]
+
+_EXPLANATIONS = {
+    "Medium": "मध्यम जोखिम: समीक्षा आवश्यक।",
+    "Low": "कोई गंभीर कानूनी जोखिम नहीं मिला।",
+}
+
+
+def _high_risk(reasons: List[str]) -> Dict:
+    return {
+        "risk_level": "High",
+        "explanation": "उच्च जोखिम: " + ", ".join(reasons)
+    }
+
+
+def analyze_risk(clause: str, full_reasons: bool = True) -> Dict:
     """
     Hindi + English clause-level risk scoring engine.
+    With full_reasons=False, stops as soon as the clause is certain to be High;
+    the explanation then lists only the reasons found so far.
     """
 
     if not clause or len(clause.strip()) < 30:
@@ -94,87 +228,38 @@ def analyze_risk(clause: str) -> Dict:
             "explanation": "यह केवल शीर्षक या अधूरा क्लॉज है।"
         }
 
-    normalized = normalize_text(clause)
-    clause_clean_hi = clean_hindi(clause)
-    clause_clean_en = clean_english(clause)
+    # Lowercase once; only clean and scan a script that is actually present
+    # (no Devanagari means no Hindi term can match, no a-z no English one)
+    low = clause.lower()
+    masks = (
+        _term_mask(_HI_AC, _RE_HI_RISK, _HI, _clean_hindi_lower(low)) if _RE_DEVANAGARI.search(low) else 0,
+        _term_mask(_EN_AC, _RE_EN_RISK, _EN, _clean_english_lower(low)) if _RE_LATIN_LOWER.search(low) else 0,
+    )
 
-    risk_score = 0
     reasons = []
 
     # 🔴 HIGH RISK — Hindi
-    if 'असीमित' in clause_clean_hi and 'दायित्व' in clause_clean_hi:
-        risk_score += 4
-        reasons.append("असीमित दायित्व")
+    risk_score = _apply_rules(_HIGH_RULES_HI, masks, 0, reasons)
 
-    if 'क्षतिपूर्ति' in clause_clean_hi:
-        risk_score += 4
-        reasons.append("पूर्ण क्षतिपूर्ति")
-
-    if 'एकतरफा' in clause_clean_hi and ('बिना' in clause_clean_hi or 'सूचना' in clause_clean_hi):
-        risk_score += 4
-        reasons.append("एकतरफा समाप्ति")
-
-    if 'भुगतान' in clause_clean_hi and ('रोक' in clause_clean_hi or 'अस्वीकृत' in clause_clean_hi):
-        risk_score += 4
-        reasons.append("भुगतान रोका जाना")
-
-    if 'दावा' in clause_clean_hi and ('परित्याग' in clause_clean_hi or 'नहीं' in clause_clean_hi):
-        risk_score += 4
-        reasons.append("भविष्य के दावों का परित्याग")
+    if not full_reasons and risk_score >= HIGH_THRESHOLD:
+        return _high_risk(reasons)
 
     # 🔴 HIGH RISK — English
-    if 'unlimited liability' in clause_clean_en:
-        risk_score += 4
-        reasons.append("Unlimited liability")
-
-    if 'indemnify' in clause_clean_en:
-        risk_score += 4
-        reasons.append("Broad indemnity obligation")
-
-    if 'terminate at any time' in clause_clean_en:
-        risk_score += 4
-        reasons.append("Unilateral termination")
+    risk_score = _apply_rules(_HIGH_RULES_EN, masks, risk_score, reasons)
 
-    if 'without notice' in clause_clean_en:
-        risk_score += 3
-        reasons.append("Termination without notice")
-
-    if 'penalty' in clause_clean_en and 'breach' in clause_clean_en:
-        risk_score += 3
-        reasons.append("Penalty on breach")
+    if not full_reasons and risk_score >= HIGH_THRESHOLD:
+        return _high_risk(reasons)
 
     # 🟠 MEDIUM RISK
-    if 'गोपनीय' in clause_clean_hi:
-        risk_score += 2
-        reasons.append("गोपनीयता दायित्व")
-
-    if 'confidential' in clause_clean_en:
-        risk_score += 2
-        reasons.append("Confidentiality obligation")
-
-    if 'विवाद' in clause_clean_hi:
-        risk_score += 2
-        reasons.append("विवाद समाधान क्लॉज")
-
-    if 'dispute' in clause_clean_en:
-        risk_score += 2
-        reasons.append("Dispute resolution clause")
+    risk_score = _apply_rules(_MEDIUM_RULES, masks, risk_score, reasons)
 
     # ---------- FINAL DECISION ----------
 
-    if risk_score >= 6:
-        return {
-            "risk_level": "High",
-            "explanation": "उच्च जोखिम: " + ", ".join(reasons)
-        }
-
-    if risk_score >= 3:
-        return {
-            "risk_level": "Medium",
-            "explanation": "मध्यम जोखिम: समीक्षा आवश्यक।"
-        }
+    level = _LEVELS[min(risk_score, HIGH_THRESHOLD)]
+    if level == "High":
+        return _high_risk(reasons)
 
     return {
-        "risk_level": "Low",
-        "explanation": "कोई गंभीर कानूनी जोखिम नहीं मिला।"
+        "risk_level": level,
+        "explanation": _EXPLANATIONS[level]
     }
@@ -5,10 +5,27 @@
 import re
 import json
 import os
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from language_detector import detect_language, normalize_text
 
+# -----------------------------
+# Optional dependencies
+# -----------------------------
+try:
+    import ahocorasick
+except Exception:
+    ahocorasick = None
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
 # -----------------------------
 # Heuristic keywords
 # -----------------------------
@@ -54,42 +71,155 @@ MEDIUM_RISK_KEYWORDS_HI = [
     "विवाद", "न्यायालय", "गोपनीयता", "दंड", "कानूनी"
 ]
 
+# -----------------------------
+# Keyword matchers
+# -----------------------------
+
+def _build_automaton(keywords: List[str]):
+    """
+    Build one Aho–Corasick automaton over all keywords.
+    Returns None when pyahocorasick is not installed.
+    """
+    if ahocorasick is None:
+        return None
+
+    automaton = ahocorasick.Automaton()
+    for k in keywords:
+        automaton.add_word(k, k)
+    automaton.make_automaton()
+    return automaton
+
+
+def _find_keywords(automaton, keywords: List[str], text: str) -> set:
+    """
+    Return the keywords present in text.
+    Single pass over text with the automaton, substring loop otherwise.
+    """
+    if automaton is None:
+        return {k for k in keywords if k in text}
+    return {k for _, k in automaton.iter(text)}
+
+
+# English terms are matched against normalized (lowercased) text, so lowercase them once here
+_HIGH_RISK_EN = frozenset(k.lower() for k in HIGH_RISK_KEYWORDS_EN)
+RISK_KEYWORDS_EN = list(dict.fromkeys(k.lower() for k in HIGH_RISK_KEYWORDS_EN + MEDIUM_RISK_KEYWORDS_EN))
+_RISK_AC_EN = _build_automaton(RISK_KEYWORDS_EN)
+
+# keyword -> weight
+_RISK_WEIGHTS_EN = {k: 3 if k in _HIGH_RISK_EN else 1 for k in RISK_KEYWORDS_EN}
+
+RISK_KEYWORDS_HI = HIGH_RISK_KEYWORDS_HI + MEDIUM_RISK_KEYWORDS_HI
+_RISK_AC_HI = _build_automaton(RISK_KEYWORDS_HI)
+_RISK_WEIGHTS_HI = {**{k: 1 for k in MEDIUM_RISK_KEYWORDS_HI}, **{k: 3 for k in HIGH_RISK_KEYWORDS_HI}}
+
+# Every reason analyze_clause_risk can report owns one bit, in output order;
+# a clause's reasons are collected as a mask and turned into text once.
+_OBLIGATIONS_REASON = "many obligations without payment"
+_REASONS = tuple(RISK_KEYWORDS_EN + RISK_KEYWORDS_HI + [_OBLIGATIONS_REASON])
+_REASON_BIT = {r: 1 << i for i, r in enumerate(_REASONS)}
+
+
+def _reasons_csv(mask: int) -> str:
+    names = []
+    while mask:
+        low = mask & -mask
+        names.append(_REASONS[low.bit_length() - 1])
+        mask ^= low
+    return ", ".join(names)
+
+_CONTRACT_KEYWORDS_EN = frozenset(k.lower() for k in CONTRACT_KEYWORDS_EN)
+_CONTRACT_KEYWORDS_HI = frozenset(k.lower() for k in CONTRACT_KEYWORDS_HI)
+_CONTRACT_AC_EN = _build_automaton(_CONTRACT_KEYWORDS_EN)
+_CONTRACT_AC_HI = _build_automaton(_CONTRACT_KEYWORDS_HI)
+
+# -----------------------------
+# Regex patterns (compiled once; inputs are already lowercased)
+# -----------------------------
+
+_RE_NUMBERED = re.compile(r"\d+\.")
+_RE_CLAUSE_SECTION = re.compile(r"\bclause\b|\bsection\b")
+_RE_PARTY = re.compile(r"\bparty\b|\bparties\b")
+_RE_OBLIGATIONS = re.compile(r"\bshall\b|\bmust\b|\bagree to\b")
+_RE_HTML_TAG = re.compile(r"<[^>]*>?")
+
 # -----------------------------
 # Paths
 # -----------------------------
 
-TEMPLATES_PATH = os.path.join(os.path.dirname(__file__), "templates")
+_MODULE_DIR = os.path.dirname(__file__)
+
+TEMPLATES_PATH = os.path.join(_MODULE_DIR, "templates")
+TEMPLATES_FILE = os.path.join(TEMPLATES_PATH, "sme_templates.json")
 os.makedirs(TEMPLATES_PATH, exist_ok=True)
 
+AUDIT_LOGS_PATH = os.path.join(_MODULE_DIR, "audit_logs")
+os.makedirs(AUDIT_LOGS_PATH, exist_ok=True)
+
+EXPORTS_PATH = os.path.join(_MODULE_DIR, "exports")
+os.makedirs(EXPORTS_PATH, exist_ok=True)
+
 # -----------------------------
 # Contract heuristics (FIXED)
 # -----------------------------
 
-def looks_like_contract(text: str) -> bool:
+def looks_like_contract(text: str, lang: Optional[str] = None) -> bool:
     """
     Improved detection for Hindi + English contracts.
     Avoids false 'not contract' warnings.
+    Pass lang when the caller has already run detect_language on this text.
     """
 
     if not text or len(text.strip()) < 80:
         return False
 
-    lang = detect_language(text)
+    if lang is None:
+        lang = detect_language(text)
+
+    return _looks_like_contract_cached(text, lang.startswith("hi"))
+
+
+# Streamlit reruns the script on every widget interaction, so the same upload is
+# checked repeatedly; results are keyed by a 16-byte digest of the text (plus the
+# language flag) so the cache never holds whole documents alive
+_CONTRACT_CACHE_SIZE = 32
+_CONTRACT_CACHE: "OrderedDict[Tuple[bytes, bool], bool]" = OrderedDict()
+_CONTRACT_CACHE_LOCK = threading.Lock()
+
+
+def _looks_like_contract_cached(text: str, hindi: bool) -> bool:
+    key = (hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest(), hindi)
+    with _CONTRACT_CACHE_LOCK:
+        result = _CONTRACT_CACHE.get(key)
+        if result is not None:
+            _CONTRACT_CACHE.move_to_end(key)
+            return result
+
+    result = _score_contract(text, hindi)
+
+    with _CONTRACT_CACHE_LOCK:
+        _CONTRACT_CACHE[key] = result
+        if len(_CONTRACT_CACHE) > _CONTRACT_CACHE_SIZE:
+            _CONTRACT_CACHE.popitem(last=False)
+    return result
+
+
+def _score_contract(text: str, hindi: bool) -> bool:
     t = text.lower()
 
-    keywords = CONTRACT_KEYWORDS_HI if lang.startswith("hi") else CONTRACT_KEYWORDS_EN
+    if hindi:
+        keywords, automaton = _CONTRACT_KEYWORDS_HI, _CONTRACT_AC_HI
+    else:
+        keywords, automaton = _CONTRACT_KEYWORDS_EN, _CONTRACT_AC_EN
 
-    score = 0
-    for k in keywords:
-        if k.lower() in t:
-            score += 1
+    # one point per distinct keyword present
+    score = len(_find_keywords(automaton, keywords, t))
 
     # structure signals
-    if re.search(r"\\d+\\.", t):
+    if _RE_NUMBERED.search(t):
         score += 1
-    if re.search(r"\\bclause\\b|\\bsection\\b", t):
+    if _RE_CLAUSE_SECTION.search(t):
         score += 1
-    if re.search(r"\\bparty\\b|\\bparties\\b", t):
+    if _RE_PARTY.search(t):
         score += 1
 
     return score >= 2
@@ -108,44 +238,49 @@ def is_resume_section(text: str) -> bool:
 # Risk analysis (STABLE ENGINE)
 # -----------------------------
 
-def analyze_clause_risk(clause: str) -> Tuple[str, str, int]:
+def analyze_clause_risk(clause: str, clause_lower: Optional[str] = None,
+                        full_reasons: bool = True) -> Tuple[str, str, int]:
     """
-    Hindi + English unified clause risk analysis
+    Hindi + English unified clause risk analysis.
+    Pass clause_lower when the caller already lowercased the clause.
+    With full_reasons=False, stops as soon as the clause is certain to be High;
+    the reasons and score then cover only the indicators found so far.
     """
 
-    c = normalize_text(clause)
+    if clause_lower is None:
+        c = normalize_text(clause)
+    else:
+        c = normalize_text(clause_lower, lowered=True)
     score = 0
-    reasons: List[str] = []
-
-    # English high risk
-    for w in HIGH_RISK_KEYWORDS_EN:
-        if w in c:
-            score += 3
-            reasons.append(w)
-
-    # English medium risk
-    for w in MEDIUM_RISK_KEYWORDS_EN:
-        if w in c:
-            score += 1
-            reasons.append(w)
-
-    # Hindi high risk
-    for w in HIGH_RISK_KEYWORDS_HI:
-        if w in clause:
-            score += 3
-            reasons.append(w)
-
-    # Hindi medium risk
-    for w in MEDIUM_RISK_KEYWORDS_HI:
-        if w in clause:
-            score += 1
-            reasons.append(w)
+    reasons = 0
+
+    # English high + medium risk (work scales with hits, not keyword count)
+    for w in _find_keywords(_RISK_AC_EN, RISK_KEYWORDS_EN, c):
+        score += _RISK_WEIGHTS_EN[w]
+        reasons |= _REASON_BIT[w]
+
+    if not full_reasons and score >= 5:
+        return "High", _reasons_csv(reasons), score
+
+    # Hindi high + medium risk (matched on the raw clause; ASCII text has no Devanagari to find)
+    if not clause.isascii():
+        for w in _find_keywords(_RISK_AC_HI, RISK_KEYWORDS_HI, clause):
+            score += _RISK_WEIGHTS_HI[w]
+            reasons |= _REASON_BIT[w]
+
+        if not full_reasons and score >= 5:
+            return "High", _reasons_csv(reasons), score
 
     # obligation pattern
-    obligations = re.findall(r'\\bshall\\b|\\bmust\\b|\\bagree to\\b', c)
-    if len(obligations) >= 3 and "payment" not in c:
+    obligations = 0
+    if "payment" not in c:
+        for _ in _RE_OBLIGATIONS.finditer(c):
+            obligations += 1
+            if obligations >= 3:
+                break
+    if obligations >= 3:
         score += 1
-        reasons.append("many obligations without payment")
+        reasons |= _REASON_BIT[_OBLIGATIONS_REASON]
 
     # scoring
     if score >= 5:
@@ -155,7 +290,7 @@ def analyze_clause_risk(clause: str) -> Tuple[str, str, int]:
     else:
         label = "Low"
 
-    reasons_csv = ", ".join(reasons) if reasons else "No strong risk indicators detected."
+    reasons_csv = _reasons_csv(reasons) if reasons else "No strong risk indicators detected."
     return label, reasons_csv, score
 
 
@@ -163,35 +298,52 @@ def analyze_clause_risk(clause: str) -> Tuple[str, str, int]:
 # Highlight terms
 # -----------------------------
 
+@functools.lru_cache(maxsize=64)
+def _highlight_pattern(terms: Tuple[str, ...]):
+    # longest first so a phrase wins over a term it contains
+    return re.compile("|".join(re.escape(t) for t in terms), re.I)
+
+
 def highlight_terms(text: str, terms: List[str]) -> str:
+    terms = tuple(sorted({t.strip() for t in terms if t and t.strip()}, key=lambda t: (-len(t), t)))
     if not terms:
         return text
-    for t in sorted(set([t.strip() for t in terms if t]), key=len, reverse=True):
-        try:
-            text = re.sub(re.escape(t), f"<span class='mark'>{t}</span>", text, flags=re.I)
-        except re.error:
-            continue
-    return text
+    # one pass, so markup inserted for one term is never re-scanned for another
+    return _highlight_pattern(terms).sub(lambda m: f"<span class='mark'>{m.group(0)}</span>", text)
 
 
 # -----------------------------
 # Alternative suggestions
 # -----------------------------
 
-def suggest_alternatives_for_clause(clause: str, risk_label: str, reasons: str) -> Optional[str]:
-    c = clause.lower()
-
-    if risk_label == "High":
-        if "indemnif" in c or "hold harmless" in c or "क्षतिपूर्ति" in clause:
-            return "Limit indemnity to direct damages and cap liability to contract value."
-        if "unlimited liability" in c or "असीमित दायित्व" in clause:
-            return "Add a liability cap and exclude indirect damages."
-        if "terminate at any time" in c or "एकतरफा समाप्ति" in clause:
-            return "Add notice period and cure period."
-
-    if risk_label == "Medium":
-        if "jurisdiction" in c or "न्यायालय" in clause:
-            return "Specify neutral arbitration location within India."
+# risk label -> ordered (markers, suggestion) rules; the first rule with a marker in the clause wins.
+# Devanagari has no case, so Hindi markers can be tested against the lowercased clause too.
+_SUGGESTION_RULES: Dict[str, Tuple[Tuple[Tuple[str, ...], str], ...]] = {
+    "High": (
+        (("indemnif", "hold harmless", "क्षतिपूर्ति"),
+         "Limit indemnity to direct damages and cap liability to contract value."),
+        (("unlimited liability", "असीमित दायित्व"),
+         "Add a liability cap and exclude indirect damages."),
+        (("terminate at any time", "एकतरफा समाप्ति"),
+         "Add notice period and cure period."),
+    ),
+    "Medium": (
+        (("jurisdiction", "न्यायालय"),
+         "Specify neutral arbitration location within India."),
+    ),
+}
+
+
+def suggest_alternatives_for_clause(clause: str, risk_label: str, reasons: str,
+                                    clause_lower: Optional[str] = None) -> Optional[str]:
+    rules = _SUGGESTION_RULES.get(risk_label)
+    if rules is None:
+        return None
+
+    c = clause.lower() if clause_lower is None else clause_lower
+    for markers, suggestion in rules:
+        if any(m in c for m in markers):
+            return suggestion
 
     return None
 
@@ -200,31 +352,44 @@ def suggest_alternatives_for_clause(clause: str, risk_label: str, reasons: str)
 # Templates loader
 # -----------------------------
 
+_DEFAULT_TEMPLATES: List[Dict[str, str]] = [
+    {
+        "title": "Limited Liability Clause (SME-friendly)",
+        "description": "Caps liability to contract value and excludes indirect damages.",
+        "text": "Except for liability arising from gross negligence or willful misconduct, each party's aggregate liability shall not exceed the total fees paid under this Agreement."
+    },
+    {
+        "title": "Mutual Indemnity (Balanced)",
+        "description": "Mutual indemnity limited to direct damages.",
+        "text": "Each party shall indemnify the other only for direct losses caused by breach."
+    }
+]
+
+# path -> (st_mtime_ns, templates); re-parsed only when the file changes
+_TEMPLATES_CACHE: Dict[str, Tuple[int, List[Dict[str, str]]]] = {}
+
+
 def load_templates() -> List[Dict[str, str]]:
-    default = [
-        {
-            "title": "Limited Liability Clause (SME-friendly)",
-            "description": "Caps liability to contract value and excludes indirect damages.",
-            "text": "Except for liability arising from gross negligence or willful misconduct, each party's aggregate liability shall not exceed the total fees paid under this Agreement."
-        },
-        {
-            "title": "Mutual Indemnity (Balanced)",
-            "description": "Mutual indemnity limited to direct damages.",
-            "text": "Each party shall indemnify the other only for direct losses caused by breach."
-        }
-    ]
-
-    path = os.path.join(TEMPLATES_PATH, "sme_templates.json")
-
-    if os.path.exists(path):
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                user_templates = json.load(f)
-                return user_templates + default
-        except Exception:
-            return default
-
-    return default
+    path = TEMPLATES_FILE
+
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return list(_DEFAULT_TEMPLATES)
+
+    cached = _TEMPLATES_CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return list(cached[1])
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            user_templates = json.load(f)
+        templates = user_templates + _DEFAULT_TEMPLATES
+    except Exception:
+        return list(_DEFAULT_TEMPLATES)
+
+    _TEMPLATES_CACHE[path] = (mtime, templates)
+    return list(templates)
 
 
 # -----------------------------
@@ -233,8 +398,13 @@ def load_templates() -> List[Dict[str, str]]:
 
 def summarize_contract_plain_english(raw_text: str, clauses_df) -> str:
     total = len(clauses_df)
-    high = int((clauses_df["risk"] == "High").sum()) if "risk" in clauses_df else 0
-    medium = int((clauses_df["risk"] == "Medium").sum()) if "risk" in clauses_df else 0
+    if "risk" in clauses_df:
+        # one pass over the column for both counts
+        counts = clauses_df["risk"].value_counts()
+        high = int(counts.get("High", 0))
+        medium = int(counts.get("Medium", 0))
+    else:
+        high = medium = 0
 
     summary = f"This contract contains {total} clauses. {high} high risk and {medium} medium risk found."
     return summary
@@ -244,22 +414,33 @@ def summarize_contract_plain_english(raw_text: str, clauses_df) -> str:
 # Audit log saving
 # -----------------------------
 
-def save_audit_log(analysis_id: int, audit: Dict[str, Any], export_json: bool = True):
-    audit_dir = os.path.join(os.path.dirname(__file__), "audit_logs")
-    os.makedirs(audit_dir, exist_ok=True)
+def _encode_json(obj: Any) -> bytes:
+    """
+    Pretty-printed UTF-8 JSON; orjson when installed, stdlib json otherwise.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
 
-    audit_file = os.path.join(audit_dir, f"{analysis_id}.json")
 
-    with open(audit_file, "w", encoding="utf-8") as f:
-        json.dump(audit, f, indent=2, ensure_ascii=False)
+def _write_atomic(path: str, blob: bytes):
+    # readers never see a half-written file
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob)
+    os.replace(tmp, path)
 
-    if export_json:
-        export_dir = os.path.join(os.path.dirname(__file__), "exports")
-        os.makedirs(export_dir, exist_ok=True)
 
-        export_file = os.path.join(export_dir, f"analysis_{analysis_id}.json")
-        with open(export_file, "w", encoding="utf-8") as ef:
-            json.dump(audit, ef, indent=2, ensure_ascii=False)
+def save_audit_log(analysis_id: int, audit: Dict[str, Any], export_json: bool = True):
+    audit_file = os.path.join(AUDIT_LOGS_PATH, f"{analysis_id}.json")
+
+    # both files hold the same document, so encode it once
+    blob = _encode_json(audit)
+    _write_atomic(audit_file, blob)
+
+    if export_json:
+        export_file = os.path.join(EXPORTS_PATH, f"analysis_{analysis_id}.json")
+        _write_atomic(export_file, blob)
 
 
 # utils.py (add this)
@@ -272,16 +453,13 @@ def strip_html_tags(text: str) -> str:
     if not text:
         return ""
 
-    # Step 1: Remove actual HTML tags (<anything>)
-    text = re.sub(r'<[^>]*>', '', text)
-
-    # Step 2: Remove common leaked literal closing tags
-    text = re.sub(r'(?i)(</?div>|</?span>|</?p>|</?section>|</?article>)\b', '', text)
-
-    # Step 3: Remove any remaining stray angle-bracket-like fragments
-    text = re.sub(r'</?[^>]*', '', text)
+    # Step 1: Remove HTML tags (<anything>) and stray fragments with no closing '>'
+    # in one pass; leaked literal tags like </div> are complete tags, so this covers them too.
+    # Every tag starts with '<', so plain text skips the regex pass entirely.
+    if "<" in text:
+        text = _RE_HTML_TAG.sub('', text)
 
-    # Step 4: Clean up multiple spaces/newlines
-    text = re.sub(r'\s+', ' ', text).strip()
+    # Step 2: Clean up multiple spaces/newlines
+    text = " ".join(text.split())
 
     return text
\ No newline at end of file